@@ -0,0 +1,166 @@
+#!/usr/bin/python
+
+# Copyright 2015 Miles Davis <mileswdavis@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Compares the time to connect with ConnectHandler(**vsp_device) against
+# fast_connect_handler(vsp_device) from module_utils/avaya_vsp_fast_connect.py.
+#
+# Both are run against a stand-in SSH server on 127.0.0.1 built with Paramiko.
+# It answers like a VSP CLI (prompt, enable, terminal more disable) and offers
+# the key exchange algorithms an older VSP release offers: no elliptic curve,
+# only the 4096 and 2048 bit Diffie-Hellman groups. The difference measured is
+# therefore the key exchange restriction alone: stock Paramiko picks group16,
+# the fast connect profile gets group14. Usage:
+#
+#   python benchmarks/bench_fast_connect.py [connections]
+
+import os
+import socket
+import sys
+import threading
+import time
+
+import paramiko
+from netmiko import ConnectHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'module_utils'))
+from avaya_vsp_fast_connect import fast_connect_handler
+
+# Set some constants for the stand-in switch.
+server_kex = ['diffie-hellman-group16-sha512', 'diffie-hellman-group14-sha256']
+server_hostname = 'VSP-Bench:1'
+server_username = 'admin'
+server_password = 'avaya123'
+
+
+class StandInServer(paramiko.ServerInterface):
+    # Password only authentication and an interactive shell, like a VSP with local auth.
+
+    def check_auth_password(self, username, password):
+        if username == server_username and password == server_password:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return 'password'
+
+    def check_channel_request(self, kind, chanid):
+        if kind == 'session':
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        return True
+
+
+def run_shell(channel):
+    # Echoes what is typed and answers each line with the switch prompt.
+    prompt = server_hostname + '>'
+    channel.sendall(('\r\n' + prompt).encode())
+    line = b''
+    while True:
+        data = channel.recv(1024)
+        if not data:
+            return
+        channel.sendall(data)
+        line += data
+        while b'\n' in line or b'\r' in line:
+            end = min(i for i in (line.find(b'\n'), line.find(b'\r')) if i >= 0)
+            command, line = line[:end].strip(), line[end + 1:]
+            if command == b'enable':
+                prompt = server_hostname + '#'
+            channel.sendall(('\r\n' + prompt).encode())
+
+
+def serve_connection(client, host_key):
+    transport = paramiko.Transport(client)
+    transport.get_security_options().kex = server_kex
+    transport.add_server_key(host_key)
+    transport.start_server(server=StandInServer())
+    channel = transport.accept(20)
+    if channel is None:
+        transport.close()
+        return
+    try:
+        run_shell(channel)
+    except (EOFError, socket.error, paramiko.SSHException):
+        pass
+    finally:
+        transport.close()
+
+
+def start_server():
+    # Starts the stand-in server on a free local port and returns the port.
+    host_key = paramiko.RSAKey.generate(2048)
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(16)
+
+    def accept_loop():
+        while True:
+            client, address = listener.accept()
+            worker = threading.Thread(target=serve_connection, args=(client, host_key))
+            worker.daemon = True
+            worker.start()
+
+    thread = threading.Thread(target=accept_loop)
+    thread.daemon = True
+    thread.start()
+    return listener.getsockname()[1]
+
+
+def time_connections(connect, device, count):
+    # Returns the connect time in seconds of each of count connections. Disconnecting is not timed.
+    timings = []
+    for attempt in range(count):
+        start = time.time()
+        handler = connect(device)
+        timings.append(time.time() - start)
+        handler.disconnect()
+    return timings
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    port = start_server()
+    vsp_device = {
+        'device_type': 'avaya_vsp',
+        'ip': '127.0.0.1',
+        'port': port,
+        'username': server_username,
+        'password': server_password,
+    }
+
+    results = []
+    for name, connect in (('ConnectHandler', lambda device: ConnectHandler(**device)),
+                          ('fast_connect_handler', fast_connect_handler)):
+        # Warm up once so imports and the first host key load are not counted.
+        time_connections(connect, vsp_device, 1)
+        timings = sorted(time_connections(connect, vsp_device, count))
+        results.append((name, sum(timings) / len(timings), timings[len(timings) // 2]))
+
+    print('%-22s %10s %10s' % ('connect', 'mean (s)', 'median (s)'))
+    for name, mean, median in results:
+        print('%-22s %10.3f %10.3f' % (name, mean, median))
+    print('Median connect time reduced by %.0f%% over %d connections.'
+          % (100 * (1 - results[1][2] / results[0][2]), count))
+
+
+if __name__ == '__main__':
+    main()
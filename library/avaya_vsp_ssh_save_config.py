@@ -41,6 +41,24 @@ options:
         description:
             - Password for SSH login
         required: true
+    fast_connect:
+        description:
+            - Connect with the tuned profile from module_utils/avaya_vsp_fast_connect.py to cut SSH key exchange time. It needs Netmiko 3 or later and Paramiko 2.6 or later, which only run on Python 3. This module still runs on Python 2 only, where Netmiko is at most 2.x, so setting fast_connect makes the module fail with a message saying so rather than connect without any gain. If the switch offers none of the fast key exchange algorithms (for example only group exchange or group16), the connection is retried once with the stock algorithm set. The module_utils directory of this repo must be in the Ansible module_utils path.
+        required: false
+        default: false
+    max_concurrent_logins:
+        description:
+            - Caps how many SSH logins run at once across all forks on the host running the module, using the login governor in module_utils/avaya_vsp_login_governor.py. Logins over the cap queue instead of failing. Useful when logins are authenticated by RADIUS or TACACS+. The module_utils directory of this repo must be in the Ansible module_utils path.
+        required: false
+    max_logins_per_second:
+        description:
+            - Caps how many SSH logins start per second across all forks on the host running the module, using the same login governor as max_concurrent_logins.
+        required: false
+    login_timeout:
+        description:
+            - Seconds to wait in the login governor queue before giving up. By default the login waits as long as it takes.
+        required: false
+        reliance: Only used if max_concurrent_logins or max_logins_per_second is set.
 '''
 
 EXAMPLES = '''
@@ -53,6 +71,17 @@ EXAMPLES = '''
     port=1022
     username=admin
     password=avaya123
+
+# Save configuration using the fast connect profile
+- avaya_vsp_ssh_save_config: host={{ inventory_hostname }} username=admin password=avaya123 fast_connect=true
+
+# Save configuration with at most 20 RADIUS logins at once and 10 per second
+- avaya_vsp_ssh_save_config:
+    host={{ inventory_hostname }}
+    username=admin
+    password=avaya123
+    max_concurrent_logins=20
+    max_logins_per_second=10
 '''
 
 from ansible.module_utils.basic import *
@@ -62,6 +91,29 @@ try:
     has_netmiko = True
 except:
     has_netmiko = False
+try:
+    from ansible.module_utils.avaya_vsp_fast_connect import fast_connect_handler
+    has_fast_connect = True
+except ImportError, err:
+    has_fast_connect = False
+    fast_connect_import_error = str(err)
+try:
+    from ansible.module_utils.avaya_vsp_login_governor import LoginGovernor
+    has_login_governor = True
+except ImportError, err:
+    has_login_governor = False
+    login_governor_import_error = str(err)
+
+def connect_switch(device, fast_connect=False, governor=None):
+    # Function takes the Netmiko device dictionary (device), a bool that determines if we use the fast connect
+    # profile (fast_connect), and the login governor to wait for (governor) if there is one. It returns a connected
+    # Netmiko SSH handler and the seconds spent waiting on the governor.
+    if governor is not None:
+        with governor.login(device['ip']) as login_wait:
+            return connect_switch(device, fast_connect)[0], login_wait
+    if fast_connect:
+        return fast_connect_handler(device), None
+    return ConnectHandler(**device), None
 
 def save_config(handler,module):
     save_command = 'copy run start'
@@ -83,13 +135,22 @@ def main():
             host=dict(required=True),
             port=dict(required=False,default=22),
             username=dict(required=True),
-            password=dict(required=True),))
+            password=dict(required=True),
+            fast_connect=dict(required=False,default=False,type='bool'),
+            max_concurrent_logins=dict(required=False,default=None,type='int'),
+            max_logins_per_second=dict(required=False,default=None,type='float'),
+            login_timeout=dict(required=False,default=None,type='float'),))
 
     ansible_arguments = module.params
 
     # Check to make sure that netmiko is there. If not then bail out.
     if not has_netmiko:
         module.fail_json(msg='Missing required Netmiko module')
+    if ansible_arguments['fast_connect'] and not has_fast_connect:
+        module.fail_json(msg='fast_connect needs module_utils/avaya_vsp_fast_connect.py: %s' % fast_connect_import_error)
+    governed = ansible_arguments['max_concurrent_logins'] is not None or ansible_arguments['max_logins_per_second'] is not None
+    if governed and not has_login_governor:
+        module.fail_json(msg='max_concurrent_logins and max_logins_per_second need module_utils/avaya_vsp_login_governor.py: %s' % login_governor_import_error)
 
     # Port the Ansible arguemnts into a Netmiko variable
     vsp_device = {
@@ -101,14 +162,23 @@ def main():
     }
 
     # Setup the Netmiko SSH Handler with the parameters pulled from Ansible. 
+    # If the login governor is in use, wait for our turn to login so the AAA servers are not flooded.
     # Catch any exceptions that might come from Netmiko and throw it to Ansible.
+    governor = None
     try:
-        ssh_handler = ConnectHandler(**vsp_device)
+        if governed:
+            governor = LoginGovernor(
+                max_concurrent=ansible_arguments['max_concurrent_logins'],
+                max_per_second=ansible_arguments['max_logins_per_second'],
+                timeout=ansible_arguments['login_timeout'])
+        ssh_handler, login_wait = connect_switch(vsp_device, ansible_arguments['fast_connect'], governor)
     except Exception, err:
         module.fail_json(msg=str(err))
 
     # Meat and Potatos. In this case, save the config.
     return_status = save_config(ssh_handler,module)
+    if governed:
+        return_status['login_wait'] = login_wait
 
     # Send Ansible a hopefully good report of successful save.
     module.exit_json(**return_status)
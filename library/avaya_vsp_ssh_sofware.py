@@ -86,6 +86,24 @@ options:
         required: false
         default: false
         reliance: This only comes into play if reboot_image_confirm is set to true, as otherwise we would not be rebooting the switch.
+    fast_connect:
+        description:
+            - Connect with the tuned profile from module_utils/avaya_vsp_fast_connect.py to cut SSH key exchange time. It needs Netmiko 3 or later and Paramiko 2.6 or later, which only run on Python 3. This module still runs on Python 2 only, where Netmiko is at most 2.x, so setting fast_connect makes the module fail with a message saying so rather than connect without any gain. If the switch offers none of the fast key exchange algorithms (for example only group exchange or group16), the connection is retried once with the stock algorithm set. This is also used when logging in again after a reboot. The module_utils directory of this repo must be in the Ansible module_utils path.
+        required: false
+        default: false
+    max_concurrent_logins:
+        description:
+            - Caps how many SSH logins run at once across all forks on the host running the module, using the login governor in module_utils/avaya_vsp_login_governor.py. This includes the logins retried while waiting for a reboot. Logins over the cap queue instead of failing. Useful when logins are authenticated by RADIUS or TACACS+. The module_utils directory of this repo must be in the Ansible module_utils path.
+        required: false
+    max_logins_per_second:
+        description:
+            - Caps how many SSH logins start per second across all forks on the host running the module, using the same login governor as max_concurrent_logins.
+        required: false
+    login_timeout:
+        description:
+            - Seconds to wait in the login governor queue before giving up. By default the login waits as long as it takes.
+        required: false
+        reliance: Only used if max_concurrent_logins or max_logins_per_second is set.
 '''
 
 EXAMPLES = '''
@@ -110,9 +128,32 @@ try:
     has_netmiko = True
 except:
     has_netmiko = False
+try:
+    from ansible.module_utils.avaya_vsp_fast_connect import fast_connect_handler
+    has_fast_connect = True
+except ImportError, err:
+    has_fast_connect = False
+    fast_connect_import_error = str(err)
+try:
+    from ansible.module_utils.avaya_vsp_login_governor import LoginGovernor
+    has_login_governor = True
+except ImportError, err:
+    has_login_governor = False
+    login_governor_import_error = str(err)
 from time import sleep
 import re
 
+def connect_switch(device, fast_connect=False, governor=None):
+    # Function takes the Netmiko device dictionary (device), a bool that determines if we use the fast connect
+    # profile (fast_connect), and the login governor to wait for (governor) if there is one. It returns a connected
+    # Netmiko SSH handler and the seconds spent waiting on the governor.
+    if governor is not None:
+        with governor.login(device['ip']) as login_wait:
+            return connect_switch(device, fast_connect)[0], login_wait
+    if fast_connect:
+        return fast_connect_handler(device), None
+    return ConnectHandler(**device), None
+
 def save_config(handler,module=0):
     # Function takes the Netmiko SSH handler (handler) and the Ansible handler (handler). It atetmpts to save the config.
     # If it is successful then it returns true.
@@ -295,9 +336,10 @@ def activate_software_version(handler, activate_version, versions, pri_back, mod
             print '**** When activating the new software we got a response we did not expect. It\'s possible the function used to do this was called incorrectly.'
         return pri_back, active_software_has_changed
 
-def reboot_switch(handler, device, wait_for_reboot, module=0):
+def reboot_switch(handler, device, wait_for_reboot, module=0, fast_connect=False, governor=None):
     # Function takes the Netmiko SSH handler (handler), a bool that determines if we are going to wait for successful reboot,
-    # and the Ansible module (module).
+    # the Ansible module (module), a bool that determines if we log back in with the fast connect profile (fast_connect),
+    # and the login governor that every login attempt waits for (governor) if there is one.
 
     # Set some constants that hopefully will not change with different versions of code.
     reboot_command = 'reset -y'
@@ -337,7 +379,7 @@ def reboot_switch(handler, device, wait_for_reboot, module=0):
             print ('**** Trying to login again...')
             login_retrys -= 1
             try:
-                new_handler = ConnectHandler(**device)
+                new_handler = connect_switch(device, fast_connect, governor)[0]
                 return new_handler
             except Exception, err:
                 if not debug_mode:
@@ -524,8 +566,17 @@ def main():
                 host=dict(required=True),
                 port=dict(required=False,default=22),
                 username=dict(required=True),
-                password=dict(required=True),))
+                password=dict(required=True),
+                fast_connect=dict(required=False,default=False,type='bool'),
+                max_concurrent_logins=dict(required=False,default=None,type='int'),
+                max_logins_per_second=dict(required=False,default=None,type='float'),
+                login_timeout=dict(required=False,default=None,type='float'),))
         ansible_arguments = module.params
+        fast_connect = ansible_arguments['fast_connect']
+        governed = ansible_arguments['max_concurrent_logins'] is not None or ansible_arguments['max_logins_per_second'] is not None
+    else:
+        fast_connect = False
+        governed = False
 
     # Check to make sure that netmiko is there. If not then bail out.
     if not has_netmiko:
@@ -533,6 +584,10 @@ def main():
             module.fail_json(msg='Missing required Netmiko module')
         else:
             print 'Missing required Netmiko module'
+    if fast_connect and not has_fast_connect:
+        module.fail_json(msg='fast_connect needs module_utils/avaya_vsp_fast_connect.py: %s' % fast_connect_import_error)
+    if governed and not has_login_governor:
+        module.fail_json(msg='max_concurrent_logins and max_logins_per_second need module_utils/avaya_vsp_login_governor.py: %s' % login_governor_import_error)
 
     # Port the Ansible arguemnts into a Netmiko variable
     if not debug_mode:
@@ -558,9 +613,16 @@ def main():
         invalid_filename = 'VSP4K.4.0.0.3.tgz'
 
     # Setup the Netmiko SSH Handler with the parameters pulled from Ansible. 
+    # If the login governor is in use, wait for our turn to login so the AAA servers are not flooded.
     # Catch any exceptions that might come from Netmiko and throw it to Ansible.
+    governor = None
     try:
-        ssh_handler = ConnectHandler(**vsp_device)
+        if governed:
+            governor = LoginGovernor(
+                max_concurrent=ansible_arguments['max_concurrent_logins'],
+                max_per_second=ansible_arguments['max_logins_per_second'],
+                timeout=ansible_arguments['login_timeout'])
+        ssh_handler, login_wait = connect_switch(vsp_device, fast_connect, governor)
     except Exception, err:
         if not debug_mode:
             module.fail_json(msg=str(err))
@@ -571,7 +633,9 @@ def main():
     overall_has_changed = False
 
     if not debug_mode:
-        return_status = save_config(ssh_handler,module)
+        return_status = {'changed':save_config(ssh_handler,module)}
+        if governed:
+            return_status['login_wait'] = login_wait
     else:
 
         # Down here should be what the real script would look like.
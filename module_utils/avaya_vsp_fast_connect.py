@@ -0,0 +1,141 @@
+#!/usr/bin/python
+
+# Copyright 2015 Miles Davis <mileswdavis@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Fast connect profile for Avaya VSP switches.
+#
+# Ansible module_utils file. The modules in library/ import it as
+# ansible.module_utils.avaya_vsp_fast_connect when fast_connect is set, and
+# any script that builds a Netmiko device dictionary for an avaya_vsp device
+# can use it directly:
+#
+#   ssh_handler = fast_connect_handler(vsp_device)
+#
+# It does the same job as ConnectHandler(**vsp_device) but only offers the
+# key exchange, cipher and MAC algorithms that are cheap for the switch CPU.
+# That way Paramiko does not pick group exchange or a 4096 bit Diffie-Hellman
+# group when the switch also supports something cheaper.
+#
+# Agent, key file and ssh_config lookups are not touched: Netmiko 4 already
+# leaves them off by default for password logins.
+#
+# The restriction is passed to Paramiko through Netmiko's disabled_algorithms
+# argument. That needs Netmiko 3 or later and Paramiko 2.6 or later, which
+# means Python 3. With anything older fast_connect_handler() raises
+# RuntimeError instead of quietly connecting like ConnectHandler().
+#
+# If the switch offers none of the fast algorithms, for example only group
+# exchange or group16, the negotiation fails. fast_connect_handler() then
+# connects once more with the stock algorithm set, so such a switch is slower
+# to reach but still reachable.
+
+import inspect
+
+try:
+    import paramiko
+    from netmiko import ConnectHandler
+    from netmiko.ssh_dispatcher import CLASS_MAPPER
+    has_netmiko = True
+except ImportError:
+    has_netmiko = False
+
+# Algorithms the VSP handles fastest, in order of preference. Anything Paramiko supports that is not
+# in these lists is disabled for the connection. The lists keep the older algorithms that early VSP
+# releases are limited to so those switches can still negotiate.
+FAST_KEX = (
+    'curve25519-sha256@libssh.org',
+    'ecdh-sha2-nistp256',
+    'diffie-hellman-group14-sha256',
+    'diffie-hellman-group14-sha1',
+    'diffie-hellman-group1-sha1',
+)
+FAST_CIPHERS = (
+    'aes128-ctr',
+    'aes128-gcm@openssh.com',
+    'aes256-ctr',
+    'aes128-cbc',
+    'aes256-cbc',
+)
+FAST_MACS = (
+    'hmac-sha2-256',
+    'hmac-sha1',
+)
+
+
+def _takes_argument(function, name):
+    # Returns True if the function takes the named keyword argument, or any keyword argument.
+    try:
+        spec = inspect.getfullargspec(function)
+        any_keyword = spec.varkw is not None
+    except AttributeError:
+        spec = inspect.getargspec(function)
+        any_keyword = spec.keywords is not None
+    return any_keyword or name in spec.args
+
+
+def _negotiation_failed(err):
+    # Returns True if the error, or an error it was raised from, is Paramiko finding no algorithm in
+    # common with the switch. Netmiko re-raises Paramiko errors as its own exceptions with the message
+    # included, so the message is what gets checked.
+    while err is not None:
+        if 'Incompatible ssh peer' in str(err):
+            return True
+        err = getattr(err, '__cause__', None) or getattr(err, '__context__', None)
+    return False
+
+
+def disabled_algorithms(kex=FAST_KEX, ciphers=FAST_CIPHERS, macs=FAST_MACS):
+    # Builds the Paramiko disabled_algorithms dictionary that leaves only the given algorithms enabled.
+    preferred = {'kex': kex, 'ciphers': ciphers, 'macs': macs}
+    supported = {
+        'kex': paramiko.Transport._preferred_kex,
+        'ciphers': paramiko.Transport._preferred_ciphers,
+        'macs': paramiko.Transport._preferred_macs,
+    }
+    disabled = {}
+    for kind in preferred:
+        # Never disable everything. If Paramiko supports none of the preferred algorithms leave it alone.
+        if set(supported[kind]) & set(preferred[kind]):
+            disabled[kind] = [name for name in supported[kind] if name not in preferred[kind]]
+    return disabled
+
+
+def fast_connect_profile(device):
+    # Takes a Netmiko device dictionary and returns a copy with the fast connect settings added. Settings
+    # already in the dictionary are left as they are.
+    profile = dict(device)
+    profile.setdefault('disabled_algorithms', disabled_algorithms())
+    return profile
+
+
+def fast_connect_handler(device):
+    # Takes a Netmiko device dictionary for an avaya_vsp device and returns a connected handler, the same
+    # way ConnectHandler(**device) would. Raises RuntimeError if the installed Netmiko or Paramiko cannot
+    # restrict the algorithms.
+    if not has_netmiko:
+        raise ImportError('Fast connect needs the Netmiko and Paramiko modules')
+    if device.get('device_type') != 'avaya_vsp':
+        raise ValueError('Fast connect only supports the avaya_vsp device type, got %s' % device.get('device_type'))
+    if not (_takes_argument(CLASS_MAPPER['avaya_vsp'].__init__, 'disabled_algorithms')
+            and _takes_argument(paramiko.SSHClient.connect, 'disabled_algorithms')):
+        raise RuntimeError('Fast connect needs Netmiko 3 or later and Paramiko 2.6 or later (Python 3). '
+                           'The installed versions cannot restrict the SSH algorithms.')
+    try:
+        return ConnectHandler(**fast_connect_profile(device))
+    except Exception as err:
+        if not _negotiation_failed(err):
+            raise
+    # The switch offers none of the fast algorithms. Connect with the stock set instead.
+    return ConnectHandler(**device)
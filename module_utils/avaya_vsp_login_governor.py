@@ -0,0 +1,235 @@
+#!/usr/bin/python
+
+# Copyright 2015 Miles Davis <mileswdavis@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Login governor for SSH logins to Avaya VSP switches.
+#
+# Ansible module_utils file, imported by the modules in library/ as
+# ansible.module_utils.avaya_vsp_login_governor. When a playbook fans out to hundreds of
+# switches, every ConnectHandler() call triggers a RADIUS or TACACS+ login at
+# the same moment and the AAA servers start to throttle or time out. The
+# governor caps how many logins run at once and how many start per second
+# across every process on the controller that shares the same state
+# directory, typically all the Ansible forks of a run:
+#
+#   governor = LoginGovernor(max_concurrent=16, max_per_second=8)
+#   with governor.login(vsp_device['ip']) as wait:
+#       ssh_handler = ConnectHandler(**vsp_device)
+#
+# Callers over the limits queue instead of failing. Only the login itself is
+# governed, the slot is given back as soon as the with block ends.
+#
+# The limits are enforced with flock() on files in the state directory, so a
+# process that dies never holds on to a slot. The state directory must be
+# owned by the current user and not be writable by anyone else, otherwise
+# another local user could hold every slot or redirect the wait log. The
+# default state directory is per user.
+#
+# Every governed login appends its wait time to a log in the state
+# directory, read back with wait_metrics(). The log is rotated once it
+# passes WAITS_LOG_MAX_BYTES, so at most two logs' worth is kept.
+
+from contextlib import contextmanager
+import errno
+import os
+import random
+import stat
+import tempfile
+import time
+
+try:
+    import fcntl
+    has_fcntl = True
+except ImportError:
+    has_fcntl = False
+
+DEFAULT_STATE_DIR = os.path.join(tempfile.gettempdir(), 'avaya_vsp_login_governor-%d' % os.getuid())
+DEFAULT_POLL_INTERVAL = 0.05
+
+SLOT_FILENAME = 'slot.%d.lock'
+RATE_FILENAME = 'rate.lock'
+WAITS_FILENAME = 'waits.log'
+WAITS_LOCK_FILENAME = 'waits.lock'
+WAITS_LOG_MAX_BYTES = 1024 * 1024
+
+
+class GovernorTimeout(Exception):
+    pass
+
+
+def _open_state_file(state_dir, filename, flags=os.O_RDWR):
+    # Never follows a symlink planted in place of a state file.
+    return os.open(os.path.join(state_dir, filename), flags | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+
+
+def _check_state_dir(state_dir):
+    # Makes sure the state directory is a real directory owned by us that nobody else can write to.
+    info = os.lstat(state_dir)
+    if not stat.S_ISDIR(info.st_mode):
+        raise RuntimeError('Login governor state directory %s is not a directory' % state_dir)
+    if info.st_uid != os.getuid():
+        raise RuntimeError('Login governor state directory %s is not owned by the current user' % state_dir)
+    if info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise RuntimeError('Login governor state directory %s is writable by other users' % state_dir)
+
+
+class LoginGovernor(object):
+    # Caps concurrent logins at max_concurrent and the login rate at max_per_second, with bursts of up to
+    # burst logins. Either limit can be None to leave it off. All processes using the same state_dir
+    # share the limits, so they should all be given the same values. If timeout is set, a login that
+    # would have to wait longer than timeout seconds raises GovernorTimeout instead.
+
+    def __init__(self, max_concurrent=None, max_per_second=None, burst=1, state_dir=DEFAULT_STATE_DIR,
+                 timeout=None, poll_interval=DEFAULT_POLL_INTERVAL):
+        if not has_fcntl:
+            raise RuntimeError('The login governor needs fcntl, which is not available on this platform')
+        if max_concurrent is not None and max_concurrent < 1:
+            raise ValueError('max_concurrent must be at least 1')
+        if max_per_second is not None and max_per_second <= 0:
+            raise ValueError('max_per_second must be greater than 0')
+        if burst < 1:
+            raise ValueError('burst must be at least 1')
+        self.max_concurrent = max_concurrent
+        self.max_per_second = max_per_second
+        self.burst = burst
+        self.state_dir = state_dir
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        try:
+            os.makedirs(state_dir, 0o700)
+        except OSError as err:
+            if err.errno != errno.EEXIST:
+                raise
+        _check_state_dir(state_dir)
+
+    def _acquire_slot(self, deadline):
+        # Blocks until one of the max_concurrent slot files could be locked and returns its descriptor.
+        # Slots are tried from a random starting point so waiting processes do not all pile onto slot 0.
+        while True:
+            first = random.randrange(self.max_concurrent)
+            for offset in range(self.max_concurrent):
+                slot = (first + offset) % self.max_concurrent
+                fd = _open_state_file(self.state_dir, SLOT_FILENAME % slot)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return fd
+                except (IOError, OSError) as err:
+                    os.close(fd)
+                    if err.errno not in (errno.EAGAIN, errno.EACCES):
+                        raise
+            if deadline is not None and time.time() >= deadline:
+                raise GovernorTimeout('Timed out waiting for a free login slot')
+            time.sleep(self.poll_interval)
+
+    def _reserve_start(self, deadline):
+        # Reserves the next start time allowed by the rate limit and returns it. The rate file holds the
+        # theoretical arrival time of the next login, so every caller gets its own start time in the
+        # order it asked and nobody has to poll. A caller whose start time would be after its deadline
+        # raises GovernorTimeout and leaves the rate file as it was, so a timed out caller never pushes
+        # back the callers after it.
+        interval = 1.0 / self.max_per_second
+        fd = _open_state_file(self.state_dir, RATE_FILENAME)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            now = time.time()
+            try:
+                arrival = float(os.read(fd, 64) or 0)
+            except ValueError:
+                arrival = 0.0
+            start = max(now, arrival - (self.burst - 1) * interval)
+            if deadline is not None and start > deadline:
+                raise GovernorTimeout('Timed out waiting for the login rate limit')
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, repr(max(arrival, now) + interval).encode())
+            return start
+        finally:
+            os.close(fd)
+
+    def _record_wait(self, host, wait):
+        # Appends the wait to the log, moving a full log aside to WAITS_FILENAME.1 first. Rotating and
+        # appending happen under a separate lock file, which is never renamed, so two processes cannot
+        # both rotate and a process cannot write to a log that was just moved aside.
+        line = '%.3f %d %s %.3f\n' % (time.time(), os.getpid(), host or '-', wait)
+        path = os.path.join(self.state_dir, WAITS_FILENAME)
+        lock_fd = _open_state_file(self.state_dir, WAITS_LOCK_FILENAME)
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            fd = _open_state_file(self.state_dir, WAITS_FILENAME, os.O_WRONLY | os.O_APPEND)
+            try:
+                if os.fstat(fd).st_size >= WAITS_LOG_MAX_BYTES:
+                    os.close(fd)
+                    os.rename(path, path + '.1')
+                    fd = _open_state_file(self.state_dir, WAITS_FILENAME, os.O_WRONLY | os.O_APPEND)
+                os.write(fd, line.encode())
+            finally:
+                os.close(fd)
+        finally:
+            os.close(lock_fd)
+
+    @contextmanager
+    def login(self, host=None):
+        # Waits until a login is allowed, then runs the with block while holding a slot. The with block
+        # gets the number of seconds spent waiting. Raises GovernorTimeout if timeout is set and the login
+        # could not start in time.
+        started = time.time()
+        deadline = None if self.timeout is None else started + self.timeout
+        fd = None
+        if self.max_concurrent is not None:
+            fd = self._acquire_slot(deadline)
+        try:
+            if self.max_per_second is not None:
+                start = self._reserve_start(deadline)
+                delay = start - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            wait = time.time() - started
+            self._record_wait(host, wait)
+            yield wait
+        finally:
+            if fd is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+
+
+def wait_metrics(state_dir=DEFAULT_STATE_DIR, since=None):
+    # Summarizes the wait times logged by every governor using state_dir, optionally only the logins
+    # after the since timestamp. Covers the current and the rotated log. Returns a dictionary with the
+    # count and the mean, median, 95th percentile and maximum wait in seconds.
+    _check_state_dir(state_dir)
+    waits = []
+    for filename in (WAITS_FILENAME + '.1', WAITS_FILENAME):
+        try:
+            with open(os.path.join(state_dir, filename)) as handle:
+                for line in handle:
+                    fields = line.split()
+                    if len(fields) != 4:
+                        continue
+                    if since is not None and float(fields[0]) < since:
+                        continue
+                    waits.append(float(fields[3]))
+        except IOError as err:
+            if err.errno != errno.ENOENT:
+                raise
+    waits.sort()
+    if not waits:
+        return {'count': 0, 'mean': 0.0, 'median': 0.0, 'p95': 0.0, 'max': 0.0}
+    return {
+        'count': len(waits),
+        'mean': sum(waits) / len(waits),
+        'median': waits[len(waits) // 2],
+        'p95': waits[min(len(waits) - 1, int(len(waits) * 0.95))],
+        'max': waits[-1],
+    }
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The helpers under test are plain files rather than an installed package.
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for directory in ('tools', 'module_utils'):
+    sys.path.insert(0, os.path.join(root, directory))
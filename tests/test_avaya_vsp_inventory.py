@@ -0,0 +1,145 @@
+from array import array
+import struct
+
+import pytest
+
+from avaya_vsp_inventory import FleetInventory, InventoryRecord, version_tuple
+
+
+def pri_back(primary, backup=None, next_boot=None):
+    return {'primary': primary, 'backup': backup, 'next boot': next_boot}
+
+
+@pytest.fixture
+def inventory():
+    inventory = FleetInventory()
+    inventory.update('sw1', ['VOSS8K.7.1.0.0.GA', 'VOSS8K.6.0.0.0.GA'],
+                     pri_back('VOSS8K.7.1.0.0.GA', 'VOSS8K.6.0.0.0.GA'), flash_free_kb=90000)
+    inventory.update('sw2', ['VOSS8K.7.1.0.0.GA', 'VOSS8K.8.0.0.0.GA'],
+                     pri_back('VOSS8K.7.1.0.0.GA', None, 'VOSS8K.8.0.0.0.GA'), flash_free_kb=20000)
+    inventory.update('sw3', ['VOSS8K.8.0.0.0.GA'], pri_back('VOSS8K.8.0.0.0.GA'), flash_free_kb=150000)
+    inventory.update('sw4', ['3.1.0.2.GA'], pri_back('3.1.0.2.GA'))
+    return inventory
+
+
+def test_version_tuple():
+    assert version_tuple('VOSS4K.4.2.1.0.GA') == (4, 2, 1, 0)
+    assert version_tuple('3.1.0.2.GA') == (3, 1, 0, 2)
+    assert version_tuple('VSP4K.4.0.0.3') == (4, 0, 0, 3)
+
+
+def test_hosts_where(inventory):
+    assert inventory.hosts_where() == ['sw1', 'sw2', 'sw3', 'sw4']
+    assert inventory.hosts_with_primary('VOSS8K.7.1.0.0.GA') == ['sw1', 'sw2']
+    assert inventory.hosts_with_next_boot('VOSS8K.8.0.0.0.GA') == ['sw2']
+    assert inventory.hosts_with_flash_free(90000) == ['sw1', 'sw3']
+    assert inventory.hosts_where(primary_before='8.0') == ['sw1', 'sw2', 'sw4']
+    assert inventory.hosts_where(primary_before=(8,), min_flash_free_kb=60000) == ['sw1']
+    assert inventory.hosts_where(primary='VOSS8K.7.1.0.0.GA', primary_before='7.0') == []
+    assert inventory.hosts_where(primary='VOSS8K.7.1.0.0.GA', next_boot_before='9.0') == ['sw2']
+    assert inventory.hosts_where(primary='unknown') == []
+
+
+def test_update_replaces_row(inventory):
+    inventory.update('sw1', ['VOSS8K.8.0.0.0.GA'], pri_back('VOSS8K.8.0.0.0.GA'), flash_free_kb=10)
+    assert len(inventory) == 4
+    assert inventory.hosts_with_primary('VOSS8K.7.1.0.0.GA') == ['sw2']
+    assert inventory.hosts_with_primary('VOSS8K.8.0.0.0.GA') == ['sw1', 'sw3']
+    assert inventory.hosts_with_flash_free(11) == ['sw2', 'sw3']
+
+
+@pytest.mark.parametrize('versions, versions_pri_back, flash_free_kb', [
+    (['A.1', None], pri_back('A.1'), None),
+    (['A\n1'], pri_back(None), None),
+    (['A.1'], pri_back('A\n1'), None),
+    (['A.1'], pri_back('A.1'), 1.5),
+    (['A.1'], pri_back('A.1'), -1),
+    (['A.1'], pri_back('A.1'), 0xFFFFFFFF),
+])
+def test_update_rejects_bad_input_without_changes(inventory, versions, versions_pri_back, flash_free_kb):
+    before = repr(inventory.record('sw1'))
+    with pytest.raises(ValueError):
+        inventory.update('sw1', versions, versions_pri_back, flash_free_kb)
+    with pytest.raises(ValueError):
+        inventory.update('new', versions, versions_pri_back, flash_free_kb)
+    assert repr(inventory.record('sw1')) == before
+    assert 'new' not in inventory
+
+
+def test_record(inventory):
+    record = inventory.record('sw2')
+    assert isinstance(record, InventoryRecord)
+    assert (record.primary, record.backup, record.next_boot) == ('VOSS8K.7.1.0.0.GA', None, 'VOSS8K.8.0.0.0.GA')
+    assert record.flash_free_kb == 20000
+    assert record.releases == ['VOSS8K.7.1.0.0.GA', 'VOSS8K.8.0.0.0.GA']
+    assert inventory.record('sw4').flash_free_kb is None
+    with pytest.raises(KeyError):
+        inventory.record('missing')
+
+
+def assert_same(first, second):
+    assert list(first) == list(second)
+    for host in first:
+        assert repr(first.record(host)) == repr(second.record(host))
+    assert first.hosts_where(primary_before='8.0', min_flash_free_kb=0) == \
+        second.hosts_where(primary_before='8.0', min_flash_free_kb=0)
+
+
+def test_round_trip(inventory, tmpdir):
+    assert_same(inventory, FleetInventory.loads(inventory.dumps()))
+    path = str(tmpdir.join('fleet.inv'))
+    inventory.save(path)
+    assert_same(inventory, FleetInventory.load(path))
+
+
+def test_round_trip_empty():
+    assert len(FleetInventory.loads(FleetInventory().dumps())) == 0
+
+
+def test_round_trip_empty_host_and_releases():
+    inventory = FleetInventory()
+    inventory.update('', [], pri_back(None))
+    loaded = FleetInventory.loads(inventory.dumps())
+    assert list(loaded) == ['']
+    assert loaded.record('').releases == []
+
+
+def byte_swapped(data):
+    # Rewrites dumps() output as if it had been written on a machine with the other byte order.
+    header = struct.Struct('<6sBB5I')
+    fields = list(header.unpack_from(data))
+    fields[2] = 1 - fields[2]
+    start = header.size + fields[5] + fields[6]
+    items = array('I')
+    items.frombytes(data[start:])
+    items.byteswap()
+    return header.pack(*fields) + data[header.size:start] + items.tobytes()
+
+
+def test_round_trip_byte_swapped(inventory):
+    assert_same(inventory, FleetInventory.loads(byte_swapped(inventory.dumps())))
+
+
+def corrupt_item(data, index, value):
+    # Overwrites the index'th 4 byte item after the string tables.
+    header = struct.Struct('<6sBB5I')
+    fields = header.unpack_from(data)
+    offset = header.size + fields[5] + fields[6] + 4 * index
+    return data[:offset] + struct.pack('=i', value) + data[offset + 4:]
+
+
+def test_loads_rejects_bad_data(inventory):
+    data = inventory.dumps()
+    with pytest.raises(ValueError):
+        FleetInventory.loads(b'nonsense')
+    with pytest.raises(ValueError):
+        FleetInventory.loads(data[:-1])
+    # The primary column starts at item 0, the release counts at item 4 * 4 hosts.
+    with pytest.raises(ValueError):
+        FleetInventory.loads(corrupt_item(data, 0, 1000))
+    with pytest.raises(ValueError):
+        FleetInventory.loads(corrupt_item(data, 0, -2))
+    with pytest.raises(ValueError):
+        FleetInventory.loads(corrupt_item(data, 16, 5))
+    with pytest.raises(ValueError):
+        FleetInventory.loads(corrupt_item(data, 20, -1))
@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+
+import pytest
+
+import avaya_vsp_login_governor
+from avaya_vsp_login_governor import GovernorTimeout, LoginGovernor, wait_metrics
+
+
+@pytest.fixture
+def state_dir(tmpdir):
+    path = str(tmpdir.join('state'))
+    os.mkdir(path, 0o700)
+    return path
+
+
+def run_logins(governor, count, hold=0.0):
+    # Runs count governed logins in parallel threads and returns (start, end) of each with block.
+    spans = []
+    lock = threading.Lock()
+
+    def login():
+        with governor.login('sw'):
+            start = time.time()
+            time.sleep(hold)
+            with lock:
+                spans.append((start, time.time()))
+
+    threads = [threading.Thread(target=login) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(spans)
+
+
+def test_invalid_limits(state_dir):
+    with pytest.raises(ValueError):
+        LoginGovernor(max_concurrent=0, state_dir=state_dir)
+    with pytest.raises(ValueError):
+        LoginGovernor(max_per_second=0, state_dir=state_dir)
+    with pytest.raises(ValueError):
+        LoginGovernor(max_per_second=1, burst=0, state_dir=state_dir)
+
+
+def test_concurrency_limit(state_dir):
+    spans = run_logins(LoginGovernor(max_concurrent=2, state_dir=state_dir), 6, hold=0.1)
+    events = sorted([(start, 1) for start, end in spans] + [(end, -1) for start, end in spans])
+    active = peak = 0
+    for moment, change in events:
+        active += change
+        peak = max(peak, active)
+    assert peak == 2
+
+
+def test_rate_limit(state_dir):
+    spans = run_logins(LoginGovernor(max_per_second=20, state_dir=state_dir), 6)
+    starts = [start for start, end in spans]
+    assert min(later - earlier for earlier, later in zip(starts, starts[1:])) >= 0.045
+
+
+def test_rate_limit_burst(state_dir):
+    governor = LoginGovernor(max_per_second=2, burst=3, state_dir=state_dir)
+    waits = []
+    for attempt in range(4):
+        with governor.login() as wait:
+            waits.append(wait)
+    assert max(waits[:3]) < 0.1
+    assert waits[3] > 0.3
+
+
+def test_slot_timeout(state_dir):
+    holder = LoginGovernor(max_concurrent=1, state_dir=state_dir)
+    waiter = LoginGovernor(max_concurrent=1, state_dir=state_dir, timeout=0.1)
+    with holder.login():
+        with pytest.raises(GovernorTimeout):
+            with waiter.login():
+                pass
+    with waiter.login():
+        pass
+
+
+def test_rate_timeout_keeps_schedule(state_dir):
+    governor = LoginGovernor(max_per_second=2, state_dir=state_dir, timeout=0.1)
+    with governor.login():
+        pass
+    for attempt in range(10):
+        with pytest.raises(GovernorTimeout):
+            with governor.login():
+                pass
+    # Only the one login that went through may hold back the next one.
+    time.sleep(0.5)
+    with governor.login() as wait:
+        assert wait < 0.1
+
+
+def test_wait_metrics(state_dir):
+    governor = LoginGovernor(max_per_second=20, state_dir=state_dir)
+    for attempt in range(3):
+        with governor.login('sw%d' % attempt):
+            pass
+    metrics = wait_metrics(state_dir)
+    assert metrics['count'] == 3
+    assert 0 <= metrics['median'] <= metrics['p95'] <= metrics['max']
+    assert wait_metrics(state_dir, since=time.time() + 60)['count'] == 0
+
+
+def test_wait_log_rotation(state_dir, monkeypatch):
+    # Each log line is about 30 bytes, so the log is rotated on the 11th login.
+    monkeypatch.setattr(avaya_vsp_login_governor, 'WAITS_LOG_MAX_BYTES', 300)
+    governor = LoginGovernor(max_concurrent=1, state_dir=state_dir)
+    for attempt in range(15):
+        with governor.login('sw'):
+            pass
+    with open(os.path.join(state_dir, 'waits.log.1')) as handle:
+        rotated = len(handle.readlines())
+    with open(os.path.join(state_dir, 'waits.log')) as handle:
+        current = len(handle.readlines())
+    assert rotated + current == 15
+    assert wait_metrics(state_dir)['count'] == 15
+
+
+def test_rejects_shared_state_dir(state_dir):
+    os.chmod(state_dir, 0o777)
+    with pytest.raises(RuntimeError):
+        LoginGovernor(max_concurrent=1, state_dir=state_dir)
+
+
+def test_does_not_follow_symlinks(state_dir, tmpdir):
+    victim = str(tmpdir.join('victim'))
+    open(victim, 'w').close()
+    os.symlink(victim, os.path.join(state_dir, 'waits.log'))
+    with pytest.raises(OSError):
+        with LoginGovernor(max_concurrent=1, state_dir=state_dir).login():
+            pass
+    assert os.path.getsize(victim) == 0
+
+
+def test_wait_log_rotation_under_load(state_dir, monkeypatch):
+    # Many writers rotating at once must not lose the rotated log. 40 lines of about 30 bytes fit in
+    # the current log plus the rotated one.
+    monkeypatch.setattr(avaya_vsp_login_governor, 'WAITS_LOG_MAX_BYTES', 750)
+    governor = LoginGovernor(max_concurrent=8, state_dir=state_dir)
+
+    def logins():
+        for attempt in range(5):
+            with governor.login('sw'):
+                pass
+
+    threads = [threading.Thread(target=logins) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert wait_metrics(state_dir)['count'] == 40
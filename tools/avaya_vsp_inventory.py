@@ -0,0 +1,372 @@
+#!/usr/bin/python
+
+# Copyright 2015 Miles Davis <mileswdavis@gmail.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Fleet inventory store for the software state of Avaya VSP switches.
+#
+# This is not an Ansible module, so it lives in tools/ rather than library/.
+# It is meant to be imported by a controller process that collects the output
+# of get_software_versions() from avaya_vsp_ssh_sofware.py across a large
+# number of switches and needs to answer compliance and upgrade planning
+# questions about them, e.g.:
+#
+#   inventory = FleetInventory()
+#   inventory.update('10.177.213.76', release_list, pri_back, flash_free_kb=81920)
+#   inventory.hosts_where(primary_before='8.0', min_flash_free_kb=60000)
+#
+# Every host is one row. The per-row columns are held in arrays of 32 bit
+# integers and every version string is stored exactly once in a string table,
+# so a fleet of 10k switches costs a few hundred kilobytes instead of a dict
+# and a list of strings per switch.
+
+from array import array
+from bisect import bisect_left
+import struct
+import sys
+
+try:
+    intern
+except NameError:
+    from sys import intern
+
+# Markers for missing values in the integer columns.
+NO_VERSION = -1
+NO_FLASH_FREE = 0xFFFFFFFF
+
+# Header of the binary format written by FleetInventory.dumps().
+INVENTORY_MAGIC = b'VSPINV'
+INVENTORY_FORMAT_VERSION = 1
+_HEADER = struct.Struct('<6sBB5I')
+_LITTLE_ENDIAN = 0
+_BIG_ENDIAN = 1
+
+# The columns, the NO_FLASH_FREE marker and the binary format all assume 4 byte C ints.
+_ITEM_SIZE = 4
+if array('i').itemsize != _ITEM_SIZE or array('I').itemsize != _ITEM_SIZE:
+    raise ImportError('avaya_vsp_inventory needs a platform with 4 byte C ints')
+
+
+def version_tuple(version):
+    # Takes a release string as printed by 'show software' and returns its numeric part as a tuple so
+    # releases can be compared. The platform prefix and the release type are dropped, so
+    # 'VOSS4K.4.2.1.0.GA' gives (4, 2, 1, 0) and '3.1.0.2.GA' gives (3, 1, 0, 2).
+    numbers = []
+    for part in version.split('.'):
+        if part.isdigit():
+            numbers.append(int(part))
+        elif numbers:
+            break
+    return tuple(numbers)
+
+
+def _array_to_bytes(values):
+    # array.tostring() was renamed to tobytes() in Python 3.
+    if hasattr(values, 'tobytes'):
+        return values.tobytes()
+    return values.tostring()
+
+
+def _array_from_bytes(typecode, data):
+    values = array(typecode)
+    if hasattr(values, 'frombytes'):
+        values.frombytes(data)
+    else:
+        values.fromstring(data)
+    return values
+
+
+class InventoryRecord(object):
+    # Read only view of one host, handed out by FleetInventory.record().
+    __slots__ = ('host', 'primary', 'backup', 'next_boot', 'flash_free_kb', 'releases')
+
+    def __init__(self, host, primary, backup, next_boot, flash_free_kb, releases):
+        self.host = host
+        self.primary = primary
+        self.backup = backup
+        self.next_boot = next_boot
+        self.flash_free_kb = flash_free_kb
+        self.releases = releases
+
+    def __repr__(self):
+        return ('InventoryRecord(host=%r, primary=%r, backup=%r, next_boot=%r, flash_free_kb=%r, releases=%r)'
+                % (self.host, self.primary, self.backup, self.next_boot, self.flash_free_kb, self.releases))
+
+
+class FleetInventory(object):
+    # Column store of the software state of a fleet of switches. Rows are never removed, a host that is
+    # updated again keeps its row.
+    __slots__ = ('_hosts', '_rows', '_strings', '_string_ids', '_version_tuples',
+                 '_primary', '_backup', '_next_boot', '_flash_free', '_releases',
+                 '_by_primary', '_by_next_boot', '_flash_keys', '_flash_rows')
+
+    def __init__(self):
+        self._hosts = []
+        self._rows = {}
+        self._strings = []
+        self._string_ids = {}
+        self._version_tuples = []
+        self._primary = array('i')
+        self._backup = array('i')
+        self._next_boot = array('i')
+        self._flash_free = array('I')
+        self._releases = []
+        self._by_primary = {}
+        self._by_next_boot = {}
+        # Sorted copy of the flash free column, rebuilt lazily on the first query after a change.
+        self._flash_keys = None
+        self._flash_rows = None
+
+    def __len__(self):
+        return len(self._hosts)
+
+    def __contains__(self, host):
+        return host in self._rows
+
+    def __iter__(self):
+        return iter(self._hosts)
+
+    def _string_id(self, value):
+        # Returns the id of a version string in the string table, adding it if it is new.
+        if value is None:
+            return NO_VERSION
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            value = intern(str(value))
+            string_id = len(self._strings)
+            self._strings.append(value)
+            self._string_ids[value] = string_id
+            self._version_tuples.append(version_tuple(value))
+        return string_id
+
+    def _string(self, string_id):
+        if string_id == NO_VERSION:
+            return None
+        return self._strings[string_id]
+
+    @staticmethod
+    def _reindex(index, old_id, new_id, row):
+        if old_id == new_id:
+            return
+        if old_id != NO_VERSION:
+            rows = index[old_id]
+            rows.discard(row)
+            if not rows:
+                del index[old_id]
+        if new_id != NO_VERSION:
+            index.setdefault(new_id, set()).add(row)
+
+    def update(self, host, versions, pri_back, flash_free_kb=None):
+        # Takes the release list and the primary/backup/next boot dictionary exactly as returned by
+        # get_software_versions() and stores them for the host, replacing anything stored before.
+        # flash_free_kb is the free space on /intflash in kilobytes, or None if it is not known.
+        # Raises ValueError for a None in the release list, for a host or release with a newline, which
+        # the binary format cannot hold, and for a flash_free_kb that is not a whole number in range.
+        # Nothing is changed if the update is rejected.
+        for value in [host] + list(versions) + list(pri_back.values()):
+            if value is not None and '\n' in value:
+                raise ValueError('Host and release names cannot contain a newline: %r' % value)
+        if None in versions:
+            raise ValueError('The release list of %s contains None' % host)
+        if flash_free_kb is None:
+            flash_free_kb = NO_FLASH_FREE
+        elif int(flash_free_kb) != flash_free_kb or not 0 <= flash_free_kb < NO_FLASH_FREE:
+            raise ValueError('flash_free_kb must be a whole number from 0 to %d: %r' % (NO_FLASH_FREE - 1, flash_free_kb))
+        else:
+            flash_free_kb = int(flash_free_kb)
+
+        primary = self._string_id(pri_back.get('primary'))
+        backup = self._string_id(pri_back.get('backup'))
+        next_boot = self._string_id(pri_back.get('next boot'))
+        releases = array('i', [self._string_id(ver) for ver in versions])
+
+        row = self._rows.get(host)
+        if row is None or self._flash_free[row] != flash_free_kb:
+            self._flash_keys = None
+            self._flash_rows = None
+        if row is None:
+            row = len(self._hosts)
+            host = intern(str(host))
+            self._hosts.append(host)
+            self._rows[host] = row
+            self._primary.append(NO_VERSION)
+            self._backup.append(NO_VERSION)
+            self._next_boot.append(NO_VERSION)
+            self._flash_free.append(NO_FLASH_FREE)
+            self._releases.append(releases)
+
+        self._reindex(self._by_primary, self._primary[row], primary, row)
+        self._reindex(self._by_next_boot, self._next_boot[row], next_boot, row)
+
+        self._primary[row] = primary
+        self._backup[row] = backup
+        self._next_boot[row] = next_boot
+        self._flash_free[row] = flash_free_kb
+        self._releases[row] = releases
+
+    def record(self, host):
+        # Returns an InventoryRecord for the host. Raises KeyError if the host is unknown.
+        row = self._rows[host]
+        flash_free_kb = self._flash_free[row]
+        return InventoryRecord(
+            self._hosts[row],
+            self._string(self._primary[row]),
+            self._string(self._backup[row]),
+            self._string(self._next_boot[row]),
+            None if flash_free_kb == NO_FLASH_FREE else flash_free_kb,
+            [self._strings[string_id] for string_id in self._releases[row]])
+
+    def _version_rows(self, index, version, before):
+        # Returns the rows whose version in the given index matches. Predicates are evaluated once per
+        # distinct version string rather than once per host.
+        if version is not None:
+            string_id = self._string_ids.get(version)
+            if before is None or string_id is None:
+                return set(index.get(string_id, ()))
+            distinct = [string_id]
+        else:
+            distinct = index.keys()
+        limit = tuple(before) if isinstance(before, (tuple, list)) else version_tuple(before)
+        rows = set()
+        for string_id in distinct:
+            if string_id in index and self._version_tuples[string_id] < limit:
+                rows.update(index[string_id])
+        return rows
+
+    def _flash_free_rows(self, min_flash_free_kb):
+        if self._flash_keys is None:
+            order = sorted(range(len(self._flash_free)), key=self._flash_free.__getitem__)
+            self._flash_rows = array('i', order)
+            self._flash_keys = array('I', [self._flash_free[row] for row in order])
+        start = bisect_left(self._flash_keys, min_flash_free_kb)
+        end = bisect_left(self._flash_keys, NO_FLASH_FREE, start)
+        return set(self._flash_rows[start:end])
+
+    def hosts_where(self, primary=None, primary_before=None, next_boot=None, next_boot_before=None,
+                    min_flash_free_kb=None):
+        # Returns the sorted list of hosts matching all of the given conditions. The *_before conditions
+        # take a release string or a tuple as returned by version_tuple() and match hosts running
+        # anything older, so primary_before='8.0' finds every host that is not yet on 8.x. Hosts with an
+        # unknown flash free space never match min_flash_free_kb.
+        candidates = None
+        for index, version, before in ((self._by_primary, primary, primary_before),
+                                       (self._by_next_boot, next_boot, next_boot_before)):
+            if version is not None or before is not None:
+                rows = self._version_rows(index, version, before)
+                candidates = rows if candidates is None else candidates & rows
+        if min_flash_free_kb is not None:
+            rows = self._flash_free_rows(min_flash_free_kb)
+            candidates = rows if candidates is None else candidates & rows
+        if candidates is None:
+            candidates = range(len(self._hosts))
+        return sorted(self._hosts[row] for row in candidates)
+
+    def hosts_with_primary(self, version):
+        return self.hosts_where(primary=version)
+
+    def hosts_with_next_boot(self, version):
+        return self.hosts_where(next_boot=version)
+
+    def hosts_with_flash_free(self, min_flash_free_kb):
+        return self.hosts_where(min_flash_free_kb=min_flash_free_kb)
+
+    def dumps(self):
+        # Serializes the inventory into a compact binary string. The layout is a fixed header followed by
+        # the host and version string tables, the four integer columns and the release lists, all in the
+        # native byte order of the writer which is recorded in the header.
+        hosts = '\n'.join(self._hosts).encode('utf-8')
+        strings = '\n'.join(self._strings).encode('utf-8')
+        release_counts = array('I', [len(releases) for releases in self._releases])
+        release_ids = array('i')
+        for releases in self._releases:
+            release_ids.extend(releases)
+        header = _HEADER.pack(INVENTORY_MAGIC, INVENTORY_FORMAT_VERSION,
+                              _LITTLE_ENDIAN if sys.byteorder == 'little' else _BIG_ENDIAN,
+                              len(self._hosts), len(self._strings), len(hosts), len(strings), len(release_ids))
+        return b''.join([header, hosts, strings,
+                         _array_to_bytes(self._primary), _array_to_bytes(self._backup),
+                         _array_to_bytes(self._next_boot), _array_to_bytes(self._flash_free),
+                         _array_to_bytes(release_counts), _array_to_bytes(release_ids)])
+
+    @classmethod
+    def loads(cls, data):
+        # Rebuilds an inventory from the output of dumps(). Raises ValueError if the data is not an
+        # inventory, is truncated or is corrupt.
+        if len(data) < _HEADER.size:
+            raise ValueError('Inventory data is truncated')
+        magic, format_version, byte_order, host_count, string_count, hosts_len, strings_len, release_len = \
+            _HEADER.unpack_from(data)
+        if magic != INVENTORY_MAGIC or format_version != INVENTORY_FORMAT_VERSION:
+            raise ValueError('Not an inventory or unsupported inventory format version')
+        swap = byte_order != (_LITTLE_ENDIAN if sys.byteorder == 'little' else _BIG_ENDIAN)
+
+        offset = _HEADER.size
+        expected = offset + hosts_len + strings_len + _ITEM_SIZE * (5 * host_count + release_len)
+        if len(data) != expected:
+            raise ValueError('Inventory data is truncated')
+
+        def take(length):
+            chunk = data[take.offset:take.offset + length]
+            take.offset += length
+            return chunk
+        take.offset = offset
+
+        def take_array(typecode, count):
+            values = _array_from_bytes(typecode, take(_ITEM_SIZE * count))
+            if swap:
+                values.byteswap()
+            return values
+
+        inventory = cls()
+        hosts = take(hosts_len).decode('utf-8')
+        strings = take(strings_len).decode('utf-8')
+        for value in (strings.split('\n') if string_count else []):
+            inventory._string_id(value)
+        for host in (hosts.split('\n') if host_count else []):
+            host = intern(str(host))
+            inventory._rows[host] = len(inventory._hosts)
+            inventory._hosts.append(host)
+        if len(inventory._hosts) != host_count or len(inventory._strings) != string_count:
+            raise ValueError('Inventory string tables are corrupt')
+
+        inventory._primary = take_array('i', host_count)
+        inventory._backup = take_array('i', host_count)
+        inventory._next_boot = take_array('i', host_count)
+        inventory._flash_free = take_array('I', host_count)
+        release_counts = take_array('I', host_count)
+        release_ids = take_array('i', release_len)
+        if sum(release_counts) != release_len:
+            raise ValueError('Inventory release lists are corrupt')
+        for column, lowest in ((inventory._primary, NO_VERSION), (inventory._backup, NO_VERSION),
+                               (inventory._next_boot, NO_VERSION), (release_ids, 0)):
+            if column and (min(column) < lowest or max(column) >= string_count):
+                raise ValueError('Inventory version ids are corrupt')
+
+        start = 0
+        for count in release_counts:
+            inventory._releases.append(release_ids[start:start + count])
+            start += count
+        for row in range(host_count):
+            inventory._reindex(inventory._by_primary, NO_VERSION, inventory._primary[row], row)
+            inventory._reindex(inventory._by_next_boot, NO_VERSION, inventory._next_boot[row], row)
+        return inventory
+
+    def save(self, filename):
+        with open(filename, 'wb') as handle:
+            handle.write(self.dumps())
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, 'rb') as handle:
+            return cls.loads(handle.read())